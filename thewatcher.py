@@ -3,19 +3,32 @@
 
 import argparse
 import atexit
+import cProfile
+import html
 import json
 import logging
 import os
+import pstats
+import queue
 import signal
+import socket
+import sqlite3
+import string
 import sys
 import threading
 import time
 import re
-from datetime import datetime, timezone
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Dict, List, Optional, Tuple
 
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
 from urllib3.util import Retry
 
 # === Yeni: Excel için pandas ===
@@ -48,6 +61,10 @@ RETRY_TOTAL = 5
 RETRY_BACKOFF_FACTOR = 0.6
 RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
 RETRY_ALLOWED_METHODS = frozenset(["GET", "POST"])
+# Tur başına tüm admin çağrılarının toplam retry hakkı + endpoint devre kesicileri
+RETRY_BUDGET_PER_TICK = 8
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_COOLDOWN_SECONDS = 120
 
 # State & Log
 STATE_FILE = "state.json"
@@ -55,9 +72,36 @@ LOG_FILE = "deposit_watcher.log"
 LOG_LEVEL = logging.INFO
 LOG_MAX_BYTES = 5 * 1024 * 1024
 LOG_BACKUP_COUNT = 3
+# JSON-lines modunda kayda eklenen deposit alanları (logging extra= ile verilir)
+LOG_DEPOSIT_FIELDS = ("id", "uid", "createdAt", "lag_ms", "enrich_ms", "send_ms")
+
+# Durum değişikliği takibi (--track-status): bu statusDesc değerlerinde deposit indeksten çıkar
+TERMINAL_STATUSES = ("success", "successful", "completed", "complete", "confirmed", "credited",
+                     "failed", "failure", "rejected", "cancelled", "canceled")
+
+# Tur süresi izleme: bu süreyi aşan turlar aşama dökümüyle loglanır; --profile özetindeki satır sayısı
+SLOW_TICK_SECONDS = 10.0
+PROFILE_TOP_N = 40
+
+# Özet raporlar (--reports hourly,daily): state.json'da tutulacak kova sayısı
+AGG_BUCKETS_KEEP = {"hourly": 48, "daily": 31}
+
+# Bildirim sink'leri (--sinks-file); sink başına retry/backoff
+SINK_RETRY_TOTAL = 3
+SINK_RETRY_BACKOFF_FACTOR = 1.0
+# Teslim edilemeyen sink'ler state['outbox']'ta kalır ve her tur tekrar denenir; bu kadar turdan sonra bırakılır
+OUTBOX_MAX_ATTEMPTS = 60
+
+# HA (iki watcher, tek lider) — --ha-db verilirse aktif
+HA_LEASE_NAME = "deposit_watcher"
+HA_LEASE_TTL_SECONDS = 15
+HA_HEARTBEAT_SECONDS = 5
+HA_DEDUP_RETENTION_SECONDS = 7 * 24 * 3600
 
 stop_event = threading.Event()
 cookie_file_mtime: Optional[float] = None
+_log_listener: Optional[QueueListener] = None
+_retry_budget_left: int = RETRY_BUDGET_PER_TICK
 raw_cookie_header: str = ""  # "name=value; ..." biçiminde
 auto_cookie_source: Optional[str] = None  # edge|chrome|firefox|brave|opera
 
@@ -65,15 +109,114 @@ auto_cookie_source: Optional[str] = None  # edge|chrome|firefox|brave|opera
 _country_code_to_names: Dict[str, List[str]] = {}
 _country_map_mtime: Optional[float] = None
 
+# === Yeni: Derlenmiş mesaj şablonları (--templates-file) ===
+_templates_file: Optional[str] = None
+_templates: Dict[str, Tuple[str, str, frozenset]] = {}
+_templates_parse_mode: Optional[str] = None
+_templates_mtime: Optional[float] = None
+
+# === Yeni: Durum değişikliği takibi ===
+_track_status: bool = False
+_terminal_statuses: frozenset = frozenset(TERMINAL_STATUSES)
+
+# === Yeni: Özet raporlar ===
+_reports_enabled: Tuple[str, ...] = ()
 
-def setup_logging() -> None:
-    from logging.handlers import RotatingFileHandler
+# === Yeni: Derlenmiş filtre kuralları (--rules-file) ===
+_rules_file: Optional[str] = None
+_rules: List[Tuple[str, List, bool, Optional[frozenset]]] = []
+_rules_default_allow: bool = True
+_rules_mtime: Optional[float] = None
+
+# === Yeni: Sink teslim sonuçları (worker thread'leri → ana döngü) ===
+_sink_results: "queue.SimpleQueue[Tuple[str, str, bool, float]]" = queue.SimpleQueue()
+_sink_inflight: set = set()  # (outbox anahtarı, sink adı)
+
+# === Yeni: HA lider kirası + ortak dedup deposu (SQLite) ===
+_ha_db_path: Optional[str] = None
+_ha_node_id: str = ""
+_ha_lease_ttl: float = HA_LEASE_TTL_SECONDS
+_ha_is_leader: bool = False
+_ha_lease_expires: float = 0.0  # kendi kiramızın bitişi (yenilenemezse liderlik bu anda düşer)
+_ha_lock = threading.Lock()
+
+
+class _JsonLineFormatter(logging.Formatter):
+    """
+    Her kayıt tek satır JSON: ts, level, msg (+ varsa deposit alanları).
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for key in LOG_DEPOSIT_FIELDS:
+            val = record.__dict__.get(key)
+            if val is not None:
+                out[key] = val
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Standart QueueHandler.prepare() mesajı çağıran thread'de formatlar; aynı süreç içi kuyrukta
+    buna gerek yok. Kaydı olduğu gibi kuyruğa atıyoruz, %-formatlama listener thread'inde yapılır.
+    (Bu yüzden log argümanları sonradan değişecek nesneler olmamalı: id/uid/sayı/str geçin.)
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(use_queue: bool = False, json_lines: bool = False) -> None:
+    """
+    use_queue: stdout + dosya handler'ları QueueListener thread'ine taşınır; poll döngüsü
+               sadece kuyruğa kayıt bırakır (yavaş disk / burst'te I/O döngüye binmez).
+    json_lines: log dosyası JSON-lines yazılır (stdout okunabilir metin kalır).
+    """
+    global _log_listener
     logger = logging.getLogger()
     logger.setLevel(LOG_LEVEL)
     fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", "%Y-%m-%d %H:%M:%S")
-    ch = logging.StreamHandler(sys.stdout); ch.setLevel(LOG_LEVEL); ch.setFormatter(fmt); logger.addHandler(ch)
+    ch = logging.StreamHandler(sys.stdout); ch.setLevel(LOG_LEVEL); ch.setFormatter(fmt)
     fh = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
-    fh.setLevel(LOG_LEVEL); fh.setFormatter(fmt); logger.addHandler(fh)
+    fh.setLevel(LOG_LEVEL); fh.setFormatter(_JsonLineFormatter() if json_lines else fmt)
+    if not use_queue:
+        logger.addHandler(ch); logger.addHandler(fh)
+        return
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.addHandler(_DeferredQueueHandler(q))
+    _log_listener = QueueListener(q, ch, fh, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """
+    Kuyruktaki kayıtları boşalt ve listener thread'ini durdur.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def _deposit_log_fields(item: Dict, **timings: float) -> Dict:
+    """
+    Deposit başına yapısal log alanları (logging extra=). lag_ms: createdAt → şimdi.
+    """
+    created_at = int(item.get("createdAt", 0) or 0)
+    fields = {
+        "id": item.get("id"),
+        "uid": item.get("uid"),
+        "createdAt": created_at or None,
+        "lag_ms": int(time.time() * 1000) - created_at if created_at else None,
+    }
+    for k, v in timings.items():
+        fields[k] = round(v, 1)
+    return fields
 
 
 def load_cookies_from_file(cookie_file: str) -> Tuple[Dict[str, str], str]:
@@ -109,11 +252,14 @@ def build_session(cookie_dict: Dict[str, str]) -> requests.Session:
     Session + retry kur; hem cookie jar’a yükle hem de kritik admin header’ları set et.
     """
     sess = requests.Session()
-    retry = Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR,
+    retry = _BudgetedRetry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR,
                   status_forcelist=RETRY_STATUS_FORCELIST, allowed_methods=RETRY_ALLOWED_METHODS,
                   raise_on_status=False)
     adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
     sess.mount("http://", adapter); sess.mount("https://", adapter)
+    # Keepalive en iyi çaba: retry yok, tur bütçesi fetch_deposits / user_info'ya kalsın
+    # (requests en uzun önek eşleşen adapter'ı seçer)
+    sess.mount(KEEPALIVE_PAGE_URL, HTTPAdapter(max_retries=0, pool_connections=1, pool_maxsize=1))
 
     # Cookie jar
     sess.cookies.clear()
@@ -174,24 +320,135 @@ def _api_headers() -> Dict[str, str]:
     }
 
 
+# === Yeni: Endpoint başına devre kesici + tur başına ortak retry bütçesi ===
+class CircuitOpenError(Exception):
+    """Devre açıkken admin API çağrısı yapılmaz."""
+
+
+class CircuitBreaker:
+    """
+    closed → (art arda N hata) → open → (cooldown dolunca) half_open: tek deneme
+    → başarılıysa closed, değilse tekrar open. half_open'da deneme sonuçlanana kadar diğer
+    çağrılar reddedilir; bu yüzden allow() True dönen her çağrı record_success/record_failure
+    ile kapatılmalıdır (bkz. record_response). Sadece ağ hataları ve 5xx sayılır;
+    401 / code!=0 gibi oturum hataları devreyi açmaz.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.time() - self.opened_at < self.cooldown:
+                return False
+            self._set_state("half_open")
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def record_response(self, resp: requests.Response) -> None:
+        # Sunucu yanıt verdiyse 5xx dışı her şey (401 dahil) erişilebilirlik açısından başarı
+        if resp.status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self) -> None:
+        self._trial_in_flight = False
+        self.failures = 0
+        if self.state != "closed":
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.time()
+            if self.state != "open":
+                self._set_state("open")
+
+    def _set_state(self, new_state: str) -> None:
+        log = logging.warning if new_state == "open" else logging.info
+        log("Devre kesici '%s': %s -> %s (art arda hata=%s)", self.name, self.state, new_state, self.failures)
+        self.state = new_state
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    "deposit": CircuitBreaker("deposit"),
+    "user_info": CircuitBreaker("user_info"),
+    "keepalive": CircuitBreaker("keepalive"),
+}
+
+
+def breaker_states() -> Dict[str, str]:
+    return {name: b.state for name, b in BREAKERS.items()}
+
+
+def reset_retry_budget(total: int = RETRY_BUDGET_PER_TICK) -> None:
+    """
+    Her tur başında çağrılır: tüm admin çağrılarının bu turdaki toplam retry hakkı.
+    """
+    global _retry_budget_left
+    _retry_budget_left = total
+
+
+class _BudgetedRetry(Retry):
+    """
+    urllib3 Retry; her yeniden deneme tur bütçesinden düşer. Bütçe bitince
+    retry tükenmiş gibi davranır (MaxRetryError), böylece bir tur dakikalarca bloklanmaz.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        global _retry_budget_left
+        if _retry_budget_left <= 0:
+            raise MaxRetryError(_pool, url, error or ResponseError("tur retry bütçesi tükendi"))
+        _retry_budget_left -= 1
+        return super().increment(method=method, url=url, response=response, error=error,
+                                 _pool=_pool, _stacktrace=_stacktrace)
+
+
 def try_keepalive(sess: requests.Session) -> None:
     """
-    Oturumu sıcak tutmak için UI sayfasına GET at.
+    Oturumu sıcak tutmak için UI sayfasına GET at. Retry yapılmaz (bkz. build_session):
+    turun başında çalıştığı için tur retry bütçesini deposit sorgusundan önce tüketmesin.
     """
+    breaker = BREAKERS["keepalive"]
+    if not breaker.allow():
+        return
     try:
         r = sess.get(KEEPALIVE_PAGE_URL, timeout=REQUEST_TIMEOUT, headers={"Cookie": raw_cookie_header})
-        if r.status_code == 401:
-            logging.warning("Keepalive 401: oturum düşmüş olabilir.")
     except Exception as e:
-        logging.debug(f"Keepalive hata: {e}")
+        breaker.record_failure()
+        logging.debug("Keepalive hata: %s", e)
+        return
+    breaker.record_response(r)
+    if r.status_code == 401:
+        logging.warning("Keepalive 401: oturum düşmüş olabilir.")
 
 
 def fetch_deposits(sess: requests.Session) -> List[Dict]:
     """
     Admin API’den en güncel deposit kayıtlarını çek.
     """
+    breaker = BREAKERS["deposit"]
+    if not breaker.allow():
+        raise CircuitOpenError("deposit devresi açık")
     payload = {"page": 1, "size": 200, "pageSize": 200, "limit": 200}
-    resp = sess.post(DEPOSIT_API_ENDPOINT, json=payload, timeout=REQUEST_TIMEOUT, headers=_api_headers())
+    try:
+        resp = sess.post(DEPOSIT_API_ENDPOINT, json=payload, timeout=REQUEST_TIMEOUT, headers=_api_headers())
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_response(resp)
     if resp.status_code == 401:
         raise PermissionError("401 Unauthorized (cookie/oturum).")
     resp.raise_for_status()
@@ -224,77 +481,776 @@ def save_state(state_file: str, state: Dict) -> None:
     os.replace(tmp, state_file)
 
 
+@lru_cache(maxsize=4096)
+def _local_iso_from_seconds(sec: int) -> str:
+    # time.localtime: yerel tz C kütüphanesinde bir kez çözülür; datetime/tzinfo nesnesi üretilmez
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+
+
 def epoch_ms_to_local_iso(ms: int) -> str:
     """
     Yeni: timezone adını kaldırdık (sadece YYYY-MM-DD HH:MM:SS)
+    Saniye bazında önbellekli (aynı saniyedeki burst'ler tekrar formatlanmaz).
     """
     try:
-        dt = datetime.fromtimestamp(ms / 1000, tz=None).astimezone()
-        return dt.strftime("%Y-%m-%d %H:%M:%S")
+        return _local_iso_from_seconds(int(ms) // 1000)
     except Exception:
-        try:
-            dt = datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return str(ms)
+        return str(ms)
 
 
-def build_telegram_message(deposit: Dict) -> str:
+@lru_cache(maxsize=4096)
+def format_number(raw: str) -> str:
     """
-    Mesaj üretimi. Country satırı eklendi (symbol'ün üstünde).
-    deposit içine (akışta) 'countryNameResolved' ve 'countryCode' alanlarını koyuyoruz.
+    '1000.50000000' -> '1,000.5' (binlik ayraç, sondaki sıfırlar atılır). Sayı değilse aynen döner.
     """
-    # Yeni: Country adı satırı (Excel’den çözümlenen)
-    country_name = str(deposit.get("countryNameResolved", "-"))
-
-    symbol = str(deposit.get("symbol", "-"))
-    amount = str(deposit.get("amount", "-"))
-    usdt_amount = str(deposit.get("usdtAmount", "-"))
-    uid = str(deposit.get("uid", "-"))
-    status_desc = str(deposit.get("statusDesc", "-"))
-    created_at = int(deposit.get("createdAt", 0) or 0)
-    when_str = epoch_ms_to_local_iso(created_at) if created_at else "-"
-
-    # get_user_info ile doldurulmuş countryCode (yoksa '-')
-    country_code_raw = str(deposit.get("countryCode", "-"))
-
-    return "\n".join([
+    try:
+        d = Decimal(raw)
+    except (InvalidOperation, ValueError):
+        return raw
+    if not d.is_finite():
+        return raw
+    return format(d.normalize(), ",f")
+
+
+# === Yeni: Mesaj şablonları (--templates-file; derlenmiş, mtime ile sıcak yeniden yükleme) ===
+def _deposit_created_str(d: Dict) -> str:
+    created_at = int(d.get("createdAt", 0) or 0)
+    return epoch_ms_to_local_iso(created_at) if created_at else "-"
+
+
+# Şablonlarda kullanılabilir alanlar → deposit'ten değer üretici (sadece şablonda geçenler hesaplanır)
+_TEMPLATE_FIELD_GETTERS = {
+    "id": lambda d: str(d.get("id", "-")),
+    "symbol": lambda d: str(d.get("symbol", "-")),
+    "amount": lambda d: str(d.get("amount", "-")),
+    "amount_fmt": lambda d: format_number(str(d.get("amount", "-"))),
+    "usdtAmount": lambda d: str(d.get("usdtAmount", "-")),
+    "usdtAmount_fmt": lambda d: format_number(str(d.get("usdtAmount", "-"))),
+    "uid": lambda d: str(d.get("uid", "-")),
+    "statusDesc": lambda d: str(d.get("statusDesc", "-")),
+    "time": _deposit_created_str,
+    # get_user_info + country_map.xlsx ile akışta doldurulan alanlar
+    "country": lambda d: str(d.get("countryNameResolved", "-")),
+    "countryCode": lambda d: str(d.get("countryCode", "-")),
+}
+# Sadece durum değişikliği şablonunda (render sırasında dışarıdan verilir)
+_TEMPLATE_EXTRA_FIELDS = frozenset(["old_status", "old_amount", "amount_change"])
+
+DEFAULT_TEMPLATES = {
+    "deposit": "\n".join([
         "🟢 Yeni Deposit",
         "",
-        f"Country: {country_name}",
-        f"symbol: {symbol}",
-        f"amount: {amount}",
+        "Country: {country}",
+        "symbol: {symbol}",
+        "amount: {amount}",
         "",
-        f"usdtAmount: {usdt_amount}",
-        f"uid: {uid}",
-        f"statusDesc: {status_desc}",
-        f"time: {when_str}",
-        f"countryCode: {country_code_raw}",
-    ])
+        "usdtAmount: {usdtAmount}",
+        "uid: {uid}",
+        "statusDesc: {statusDesc}",
+        "time: {time}",
+        "countryCode: {countryCode}",
+    ]),
+    "status_change": "\n".join([
+        "🔄 Deposit Durumu Değişti",
+        "",
+        "symbol: {symbol}",
+        "amount: {amount_change}",
+        "usdtAmount: {usdtAmount}",
+        "uid: {uid}",
+        "statusDesc: {old_status} → {statusDesc}",
+        "time: {time}",
+    ]),
+}
+
+_MARKDOWN_V2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+_MARKDOWN_SPECIAL = re.compile(r"([_*`\[])")
+_HTML_TAG = re.compile(r"<[^>]+>")
+# Markdown biçim karakterleri atılır, kaçışlı karakter (\x) kendisi olarak kalır
+_MARKDOWN_MARKUP = re.compile(r"\\(.)|[*_~`]")
+
+
+def _plain_literal(text: str, parse_mode: Optional[str]) -> str:
+    if parse_mode == "HTML":
+        return html.unescape(_HTML_TAG.sub("", text))
+    if parse_mode in ("Markdown", "MarkdownV2"):
+        return _MARKDOWN_MARKUP.sub(lambda m: m.group(1) or "", text)
+    return text
+
+
+def _compile_template(name: str, fmt: str, parse_mode: Optional[str] = None) -> Tuple[str, str, frozenset]:
+    """
+    Şablonu bir kez ayrıştır, alan adlarını doğrula.
+    Dönüş: (format string, biçimlendirmesiz format string, kullanılan alanlar). İkincisi
+    Telegram dışı sink'ler için: sabit metindeki HTML etiketleri / Markdown işaretleri çıkarılır.
+    """
+    fields = set()
+    plain_parts: List[str] = []
+    for literal, field, spec, conv in string.Formatter().parse(fmt):
+        plain_parts.append(_plain_literal(literal, parse_mode).replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field not in _TEMPLATE_FIELD_GETTERS and field not in _TEMPLATE_EXTRA_FIELDS:
+            raise ValueError(f"Şablon '{name}': bilinmeyen alan {{{field}}}")
+        fields.add(field)
+        plain_parts.append("{" + field + (f"!{conv}" if conv else "") + (f":{spec}" if spec else "") + "}")
+    plain_fmt = "".join(plain_parts)
+    # Alan değerleri her zaman str: ':.2f' gibi biçimler render'da patlar → yüklerken reddet
+    sample = {f: "-" for f in fields}
+    try:
+        fmt.format_map(sample)
+        plain_fmt.format_map(sample)
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        raise ValueError(f"Şablon '{name}' render edilemiyor ({e}); sayı biçimi için *_fmt alanlarını kullanın")
+    return fmt, plain_fmt, frozenset(fields)
+
+
+def _escape_for_parse_mode(val: str) -> str:
+    if _templates_parse_mode == "HTML":
+        return html.escape(val, quote=False)
+    if _templates_parse_mode == "MarkdownV2":
+        return _MARKDOWN_V2_SPECIAL.sub(r"\\\1", val)
+    if _templates_parse_mode == "Markdown":
+        return _MARKDOWN_SPECIAL.sub(r"\\\1", val)
+    return val
+
+
+def _load_templates_if_needed() -> None:
+    """
+    templates.json değiştiyse derle (yoksa varsayılanlar). Hatalı dosyada önceki şablonlar korunur.
+    Örnek:
+      {"parse_mode": "HTML",
+       "deposit": "<b>🟢 Yeni Deposit</b>\\n{country} | {symbol} {amount_fmt}\\nusdt: {usdtAmount_fmt}\\nuid: {uid}",
+       "status_change": "🔄 {id}: {old_status} → {statusDesc}"}
+    parse_mode: HTML | Markdown | MarkdownV2 (alan değerleri otomatik kaçışlanır). Eksik şablon varsayılana düşer.
+    """
+    global _templates, _templates_parse_mode, _templates_mtime
+    if not _templates:
+        _templates = {k: _compile_template(k, v) for k, v in DEFAULT_TEMPLATES.items()}
+    if not _templates_file:
+        return
+    try:
+        mtime = os.path.getmtime(_templates_file)
+        if _templates_mtime is not None and mtime == _templates_mtime:
+            return
+        with open(_templates_file, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        parse_mode = cfg.get("parse_mode") or None
+        if parse_mode not in (None, "HTML", "Markdown", "MarkdownV2"):
+            raise ValueError(f"Geçersiz parse_mode: {parse_mode!r}")
+        compiled = {k: _compile_template(k, cfg.get(k) or v, parse_mode) for k, v in DEFAULT_TEMPLATES.items()}
+        _templates, _templates_parse_mode, _templates_mtime = compiled, parse_mode, mtime
+        logging.info("Şablonlar yüklendi (parse_mode=%s).", parse_mode or "-")
+    except Exception as e:
+        logging.warning("%s okunamadı, önceki şablonlar geçerli: %s", _templates_file, e)
+
+
+def render_template(name: str, deposit: Dict, plain: bool = False, **extra: str) -> str:
+    """
+    plain=True: Telegram dışı sink'ler için biçimlendirmesiz metin (kaçışlama yapılmaz).
+    """
+    if not _templates:
+        _load_templates_if_needed()
+    fmt, plain_fmt, fields = _templates[name]
+    values = {}
+    for f in fields:
+        val = extra[f] if f in extra else _TEMPLATE_FIELD_GETTERS[f](deposit)
+        values[f] = val if plain else _escape_for_parse_mode(val)
+    return (plain_fmt if plain else fmt).format_map(values)
+
+
+def build_telegram_message(deposit: Dict, plain: bool = False) -> str:
+    """
+    Mesaj üretimi ('deposit' şablonu). Country satırı eklendi (symbol'ün üstünde).
+    deposit içine (akışta) 'countryNameResolved' ve 'countryCode' alanlarını koyuyoruz.
+    """
+    return render_template("deposit", deposit, plain=plain)
+
+
+def build_status_change_message(deposit: Dict, old_fp: List[str], plain: bool = False) -> str:
+    """
+    Daha önce görülmüş depositin statusDesc / amount değişimi ('status_change' şablonu).
+    """
+    old_status, old_amount = old_fp
+    new_amount = _status_fingerprint(deposit)[1]
+    amount_change = f"{old_amount} → {new_amount}" if old_amount != new_amount else new_amount
+    return render_template("status_change", deposit, plain=plain, old_status=old_status, old_amount=old_amount,
+                           amount_change=amount_change)
 
 
 def send_telegram_message(bot_token: str, chat_id: str, text: str,
                           thread_id: Optional[int] = None,
-                          disable_web_page_preview: bool = True) -> bool:
+                          disable_web_page_preview: bool = True,
+                          parse_mode: Optional[str] = None) -> bool:
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
     payload = {"chat_id": chat_id, "text": text, "disable_web_page_preview": disable_web_page_preview}
     if thread_id is not None:
         payload["message_thread_id"] = int(thread_id)
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
     try:
         r = requests.post(url, json=payload, timeout=REQUEST_TIMEOUT)
         if r.status_code != 200:
-            logging.error(f"Telegram hata kodu: {r.status_code} - {r.text}")
+            logging.error("Telegram hata kodu: %s - %s", r.status_code, r.text)
             return False
         j = r.json()
         if not j.get("ok", False):
-            logging.error(f"Telegram 'ok': False -> {j}")
+            logging.error("Telegram 'ok': False -> %s", j)
             return False
         return True
     except Exception as e:
-        logging.error(f"Telegram gönderim hatası: {e}")
+        logging.error("Telegram gönderim hatası: %s", e)
         return False
 
 
+# === Yeni: Bildirim sink'leri (telegram / webhook / dosya / stdout), paralel fan-out ===
+def _to_float(val) -> Optional[float]:
+    try:
+        return float(val)
+    except Exception:
+        return None
+
+
+def _public_fields(item: Dict) -> Dict:
+    """
+    Dış sink'lere giden deposit: iç işaretler ('_' ile başlayan) çıkarılır.
+    """
+    return {k: v for k, v in item.items() if not str(k).startswith("_")}
+
+
+class NotificationSink(ABC):
+    """
+    Tek bir bildirim hedefi. Her sink'in kendi tek thread'lik kuyruğu vardır:
+    - sink içi sıra korunur, yavaş bir sink diğerlerini ve poll döngüsünü bekletmez,
+    - retry/backoff sink'e özeldir (stop_event ile kesilebilir bekleme); tükenirse
+      kayıt outbox'ta kalır ve sonraki turda sadece bu sink'e tekrar gönderilir.
+    Yönlendirme (symbols / min_usdt) mesaj formatlanmadan ve zenginleştirmeden önce uygulanır.
+    plain_text: şablonun parse_mode biçimlendirmesi olmadan düz metin alır (Telegram dışı sink'ler).
+    """
+    kind = "base"
+    plain_text = True
+
+    def __init__(self, name: str, symbols: Optional[List[str]] = None, min_usdt: Optional[float] = None,
+                 retries: int = SINK_RETRY_TOTAL, backoff: float = SINK_RETRY_BACKOFF_FACTOR):
+        self.name = name
+        self.symbols = {str(s).upper() for s in symbols} if symbols else None
+        self.min_usdt = _to_float(min_usdt) if min_usdt is not None else None
+        self.retries = max(1, int(retries))
+        self.backoff = float(backoff)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{name}")
+
+    def accepts(self, item: Dict) -> bool:
+        routes = item.get("_routeSinks")
+        if routes is not None and self.name not in routes:
+            return False
+        if self.symbols is not None and str(item.get("symbol", "")).upper() not in self.symbols:
+            return False
+        if self.min_usdt is not None:
+            usdt = _to_float(item.get("usdtAmount"))
+            if usdt is None or usdt < self.min_usdt:
+                return False
+        return True
+
+    @abstractmethod
+    def deliver(self, text: str, item: Dict) -> bool:
+        """Tek gönderim denemesi; başarılıysa True."""
+
+    def submit(self, text: str, item: Dict) -> "Future[bool]":
+        return self._executor.submit(self._deliver_with_retry, text, item)
+
+    def _deliver_with_retry(self, text: str, item: Dict) -> bool:
+        for attempt in range(self.retries):
+            try:
+                if self.deliver(text, item):
+                    return True
+            except Exception as e:
+                logging.warning("Sink '%s' gönderim hatası (id=%s, deneme %s/%s): %s",
+                                self.name, item.get("id"), attempt + 1, self.retries, e)
+            if attempt + 1 < self.retries and stop_event.wait(self.backoff * (2 ** attempt)):
+                break
+        logging.error("Sink '%s' gönderimi başarısız | id=%s", self.name, item.get("id"))
+        return False
+
+    def close(self) -> None:
+        # Kuyrukta bekleyenler iptal edilir (outbox'ta kalır, restart sonrası gönderilir)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class TelegramSink(NotificationSink):
+    kind = "telegram"
+    plain_text = False
+
+    def __init__(self, name: str, bot_token: str, chat_id: str, thread_id: Optional[int] = None, **kw):
+        super().__init__(name, **kw)
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+
+    def deliver(self, text: str, item: Dict) -> bool:
+        return send_telegram_message(self.bot_token, self.chat_id, text, self.thread_id,
+                                     parse_mode=_templates_parse_mode)
+
+
+class WebhookSink(NotificationSink):
+    kind = "webhook"
+
+    def __init__(self, name: str, url: str, headers: Optional[Dict[str, str]] = None, **kw):
+        super().__init__(name, **kw)
+        self.url = url
+        # Sadece bu sink'in worker thread'i kullanır → bağlantı tekrar kullanımı güvenli
+        self._sess = requests.Session()
+        if headers:
+            self._sess.headers.update(headers)
+
+    def deliver(self, text: str, item: Dict) -> bool:
+        r = self._sess.post(self.url, data=json.dumps({"text": text, "deposit": _public_fields(item)}, ensure_ascii=False, default=str),
+                            headers={"Content-Type": "application/json"}, timeout=REQUEST_TIMEOUT)
+        if not (200 <= r.status_code < 300):
+            logging.warning("Webhook '%s' hata kodu: %s", self.name, r.status_code)
+            return False
+        return True
+
+
+class FileSink(NotificationSink):
+    kind = "file"
+
+    def __init__(self, name: str, path: str, **kw):
+        super().__init__(name, **kw)
+        self.path = path
+
+    def deliver(self, text: str, item: Dict) -> bool:
+        line = json.dumps({"ts": round(time.time(), 3), "text": text, "deposit": _public_fields(item)}, ensure_ascii=False, default=str)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return True
+
+
+class StdoutSink(NotificationSink):
+    kind = "stdout"
+
+    def deliver(self, text: str, item: Dict) -> bool:
+        sys.stdout.write(text + "\n\n")
+        sys.stdout.flush()
+        return True
+
+
+SINK_TYPES = {cls.kind: cls for cls in (TelegramSink, WebhookSink, FileSink, StdoutSink)}
+
+
+def load_sinks(sinks_file: Optional[str], bot_token: str, chat_id: str, thread_id: Optional[int]) -> List[NotificationSink]:
+    """
+    sinks.json yoksa: CLI'daki Telegram ayarlarıyla tek sink (eski davranış).
+    Örnek sinks.json:
+      {"sinks": [
+        {"type": "telegram", "name": "tg"},                          # token/chat_id verilmezse CLI'dakiler
+        {"type": "webhook", "url": "https://...", "min_usdt": 1000},
+        {"type": "file", "path": "audit.jsonl"},
+        {"type": "stdout", "symbols": ["BTC", "ETH"]}
+      ]}
+    Ortak alanlar: name, symbols, min_usdt, retries, backoff
+    """
+    if not sinks_file:
+        return [TelegramSink("telegram", bot_token, chat_id, thread_id)]
+    with open(sinks_file, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    sinks: List[NotificationSink] = []
+    for i, sc in enumerate(cfg.get("sinks") or []):
+        sc = dict(sc)
+        kind = str(sc.pop("type", "")).lower()
+        cls = SINK_TYPES.get(kind)
+        if cls is None:
+            raise ValueError(f"Bilinmeyen sink tipi: {kind!r}")
+        name = str(sc.pop("name", f"{kind}{i}"))
+        if cls is TelegramSink:
+            sc["bot_token"] = sc.pop("token", None) or bot_token
+            sc["chat_id"] = str(sc.get("chat_id") or chat_id)
+            sc.setdefault("thread_id", thread_id)
+        sinks.append(cls(name, **sc))
+    if not sinks:
+        raise ValueError(f"{sinks_file} içinde sink tanımı yok")
+    logging.info("Sink'ler yüklendi: %s", ", ".join(f"{s.name}({s.kind})" for s in sinks))
+    return sinks
+
+
+def _outbox_text(entry: Dict, plain: bool) -> str:
+    if entry["kind"] == "status":
+        return build_status_change_message(entry["item"], entry["old_fp"], plain=plain)
+    return build_telegram_message(entry["item"], plain=plain)
+
+
+def _future_ok(fut: "Future[bool]") -> bool:
+    if fut.cancelled():
+        return False
+    return fut.exception() is None and bool(fut.result())
+
+
+def outbox_add(state: Dict, key: str, kind: str, item: Dict, sink_names: List[str], **extra) -> Dict:
+    """
+    Bildirimi state['outbox']'a yaz: hangi sink'lere henüz teslim edilmediği ('pending') burada tutulur.
+    Restart sonrası da kalan sink'lere gönderim devam eder.
+    """
+    entry = {"kind": kind, "item": _public_fields(item), "pending": list(sink_names), "attempts": 0}
+    entry.update(extra)
+    state.setdefault("outbox", {})[key] = entry
+    return entry
+
+
+def outbox_dispatch(key: str, entry: Dict, sinks_by_name: Dict[str, "NotificationSink"]) -> None:
+    """
+    Kaydın bekleyen sink'lerine mesajı bırak; beklemez. Metin biçim başına (Telegram / düz) bir kez formatlanır.
+    Sonuçlar add_done_callback ile _sink_results kuyruğuna düşer (bkz. outbox_collect).
+    Formatlama / kuyruğa bırakma hatası sadece bu kaydı etkiler: loglanır, kayıt 'pending'de kalır
+    ve outbox_retry'da OUTBOX_MAX_ATTEMPTS'a sayılır.
+    """
+    texts: Dict[bool, str] = {}
+    for name in list(entry["pending"]):
+        if (key, name) in _sink_inflight:
+            continue
+        sink = sinks_by_name.get(name)
+        if sink is None:
+            # Sink yapılandırmadan çıkarılmış
+            entry["pending"].remove(name)
+            continue
+        try:
+            if sink.plain_text not in texts:
+                texts[sink.plain_text] = _outbox_text(entry, sink.plain_text)
+            t0 = time.perf_counter()
+            fut = sink.submit(texts[sink.plain_text], entry["item"])
+        except Exception as e:
+            logging.error("Bildirim kuyruğa bırakılamadı | anahtar=%s sink=%s: %s", key, name, e)
+            continue
+        _sink_inflight.add((key, name))
+        fut.add_done_callback(lambda f, k=key, n=name, t=t0: _sink_results.put(
+            (k, n, _future_ok(f), (time.perf_counter() - t) * 1000)))
+
+
+def outbox_collect(state: Dict) -> Tuple[List[Dict], bool]:
+    """
+    Biten sink gönderimlerini (bloklamadan) işle. Başarılı sink kayıttan düşer; başarısız olan
+    'pending'de kalır ve outbox_retry ile sonraki turda sadece o sink'e tekrar gönderilir.
+    Dönüş: (tüm sink'lere teslim edilmiş kayıtlar, state değişti mi)
+    """
+    outbox: Dict[str, Dict] = state.setdefault("outbox", {})
+    completed: List[Dict] = []
+    changed = False
+    while True:
+        try:
+            key, name, ok, send_ms = _sink_results.get_nowait()
+        except queue.Empty:
+            break
+        _sink_inflight.discard((key, name))
+        entry = outbox.get(key)
+        if entry is None:
+            continue
+        entry["send_ms"] = max(entry.get("send_ms", 0.0), send_ms)
+        if not ok:
+            logging.error("Sink '%s' teslim edemedi, sonraki turda tekrar denenecek | anahtar=%s", name, key)
+            continue
+        if name in entry["pending"]:
+            entry["pending"].remove(name)
+            changed = True
+        if not entry["pending"]:
+            del outbox[key]
+            completed.append(entry)
+            try:
+                ha_mark_sent(key)
+            except Exception as e:
+                logging.warning("HA gönderildi işareti yazılamadı (anahtar=%s): %s", key, e)
+    return completed, changed
+
+
+def outbox_retry(state: Dict, sinks_by_name: Dict[str, "NotificationSink"]) -> bool:
+    """
+    Teslim edilemeyen (uçuşta olmayan) sink'leri tekrar kuyruğa bırak. state değiştiyse True.
+    """
+    outbox: Dict[str, Dict] = state.setdefault("outbox", {})
+    changed = False
+    for key, entry in list(outbox.items()):
+        failed = [n for n in entry["pending"] if (key, n) not in _sink_inflight]
+        if not failed:
+            continue
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        changed = True
+        if entry["attempts"] > OUTBOX_MAX_ATTEMPTS or not any(n in sinks_by_name for n in failed):
+            logging.error("Bildirim bırakıldı (%s tur denendi) | anahtar=%s sink=%s",
+                          entry["attempts"] - 1, key, ",".join(failed))
+            del outbox[key]
+            continue
+        # HA: kira el değiştirdiyse bildirim başka node'a geçmiş / teslim edilmiş olabilir
+        try:
+            if not ha_claim(key):
+                logging.info("Bildirim başka node'da, outbox'tan çıkarıldı | anahtar=%s", key)
+                del outbox[key]
+                continue
+        except Exception as e:
+            logging.warning("HA sahiplik kontrolü başarısız (anahtar=%s): %s", key, e)
+            continue
+        outbox_dispatch(key, entry, sinks_by_name)
+    return changed
+
+
+def _log_delivered(entry: Dict) -> None:
+    item = entry["item"]
+    log_fields = _deposit_log_fields(item, enrich_ms=entry.get("enrich_ms", 0.0), send_ms=entry.get("send_ms", 0.0))
+    if entry["kind"] == "status":
+        logging.info("Durum değişikliği gönderildi | id=%s statusDesc=%s", item.get('id'), item.get('statusDesc'),
+                     extra=log_fields)
+    else:
+        logging.info("Gönderildi | id=%s createdAt=%s", item.get('id'), item.get('createdAt'), extra=log_fields)
+
+
+def close_sinks(sinks: List[NotificationSink]) -> None:
+    for s in sinks:
+        try:
+            s.close()
+        except Exception as e:
+            logging.debug("Sink kapatma hatası (%s): %s", s.name, e)
+
+
+# === Yeni: Filtre / yönlendirme kuralları (rules.json, mtime ile sıcak yeniden yükleme) ===
+def _compile_rule(idx: int, rc: Dict) -> Tuple[str, List, bool, Optional[frozenset]]:
+    """
+    Tek kuralı (isim, koşul listesi, allow?, sink adları) biçimine derle.
+    Koşullar önceden set/float'a çevrilir; değerlendirme sırasında parse yapılmaz.
+    """
+    name = str(rc.get("name") or f"rule{idx}")
+    action = str(rc.get("action", "allow")).lower()
+    if action not in ("allow", "deny"):
+        raise ValueError(f"Kural '{name}': geçersiz action {action!r}")
+    conds: List = []
+    if rc.get("symbols"):
+        symbols = frozenset(str(x).upper() for x in rc["symbols"])
+        conds.append(lambda it, s=symbols: str(it.get("symbol", "")).upper() in s)
+    if rc.get("statuses"):
+        statuses = frozenset(str(x).lower() for x in rc["statuses"])
+        conds.append(lambda it, s=statuses: str(it.get("statusDesc", "")).lower() in s)
+    if rc.get("uids"):
+        uids = frozenset(_normalize_deposit_id(x) for x in rc["uids"])
+        conds.append(lambda it, s=uids: _normalize_deposit_id(it.get("uid")) in s)
+    for key, field, is_min in (("min_amount", "amount", True), ("max_amount", "amount", False),
+                               ("min_usdt", "usdtAmount", True), ("max_usdt", "usdtAmount", False)):
+        if rc.get(key) is None:
+            continue
+        limit = _to_float(rc[key])
+        if limit is None:
+            raise ValueError(f"Kural '{name}': {key} sayı değil")
+        if is_min:
+            conds.append(lambda it, f=field, lim=limit: (_to_float(it.get(f)) or 0.0) >= lim)
+        else:
+            conds.append(lambda it, f=field, lim=limit: (_to_float(it.get(f)) or 0.0) < lim)
+    sinks = frozenset(str(x) for x in rc["sinks"]) if rc.get("sinks") else None
+    return name, conds, action == "allow", sinks
+
+
+def _load_rules_if_needed() -> None:
+    """
+    rules.json değiştiyse derle. Hatalı dosyada önceki kurallar korunur.
+    Örnek:
+      {"default": "deny",
+       "rules": [
+         {"name": "blacklist", "uids": [1001, 1002], "action": "deny"},
+         {"name": "big", "min_usdt": 1000, "action": "allow"},
+         {"name": "btc-eth", "symbols": ["BTC", "ETH"], "statuses": ["Completed"], "min_amount": 0.01,
+          "action": "allow", "sinks": ["telegram"]}
+       ]}
+    İlk eşleşen kural kazanır; hiçbiri eşleşmezse "default" (varsayılan allow).
+    "sinks" verilirse deposit sadece o isimli sink'lere yönlendirilir.
+    """
+    global _rules, _rules_default_allow, _rules_mtime
+    if not _rules_file:
+        return
+    try:
+        mtime = os.path.getmtime(_rules_file)
+        if _rules_mtime is not None and mtime == _rules_mtime:
+            return
+        with open(_rules_file, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        compiled = [_compile_rule(i, rc) for i, rc in enumerate(cfg.get("rules") or [])]
+        default_allow = str(cfg.get("default", "allow")).lower() != "deny"
+        _rules, _rules_default_allow, _rules_mtime = compiled, default_allow, mtime
+        logging.info("Kurallar yüklendi (%s kural, default=%s).", len(compiled), "allow" if default_allow else "deny")
+    except Exception as e:
+        logging.warning("%s okunamadı, önceki kurallar geçerli: %s", _rules_file, e)
+
+
+def evaluate_rules(item: Dict) -> bool:
+    """
+    Deposit geçer mi? Geçerse ve kural sink kısıtı taşıyorsa item['_routeSinks'] yazılır.
+    """
+    for _name, conds, allow, sinks in _rules:
+        if all(c(item) for c in conds):
+            if allow and sinks is not None:
+                item["_routeSinks"] = sinks
+            return allow
+    return _rules_default_allow
+
+
+# === Yeni: Durum değişikliği takibi (terminal olmayan depositler için id → (statusDesc, amount)) ===
+def _status_fingerprint(item: Dict) -> List[str]:
+    return [str(item.get("statusDesc", "")), str(item.get("amount", ""))]
+
+
+def _is_terminal_status(status_desc: str) -> bool:
+    return status_desc.strip().lower() in _terminal_statuses
+
+
+def diff_status_index(state: Dict, deposits: List[Dict]) -> Tuple[List[Tuple[Dict, List[str]]], bool]:
+    """
+    Poll listesini state['status_index'] ile tek geçişte (O(n)) karşılaştır.
+    - İndekste olup parmak izi değişen → (item, eski_parmak_izi) olayı,
+    - terminal duruma geçen veya listeden düşen → indeksten çıkar (bellek sınırlı kalır),
+    - yeni ve terminal olmayan → sessizce indekse ekle (yeni deposit bildirimi ayrıca gider).
+    İkinci dönüş: indeks değişti mi (state kaydı gerekir mi).
+    """
+    index: Dict[str, List[str]] = state.setdefault("status_index", {})
+    changes: List[Tuple[Dict, List[str]]] = []
+    dirty = False
+    seen = set()
+    for item in deposits:
+        key = _normalize_deposit_id(item.get("id"))
+        seen.add(key)
+        fp = _status_fingerprint(item)
+        old = index.get(key)
+        terminal = _is_terminal_status(fp[0])
+        if old is None:
+            if not terminal:
+                index[key] = fp
+                dirty = True
+            continue
+        if old != fp:
+            changes.append((item, old))
+            dirty = True
+        if terminal:
+            del index[key]
+            dirty = True
+        elif old != fp:
+            index[key] = fp
+    for key in [k for k in index if k not in seen]:
+        del index[key]
+        dirty = True
+    return changes, dirty
+
+
+# === Yeni: Saatlik / günlük özet (artımlı sayaçlar; state.json veya HA'da ortak SQLite) ===
+_AGG_PERIOD_FORMATS = {"hourly": "%Y-%m-%d %H:00", "daily": "%Y-%m-%d"}
+_AGG_PERIOD_TITLES = {"hourly": "Saatlik", "daily": "Günlük"}
+
+
+def _agg_load(state: Dict) -> Dict:
+    """
+    Özet sayaçları; turda bir kez okunur, tur boyunca bellekte güncellenir (bkz. _agg_store).
+    HA açıksa ortak SQLite'taki kv tablosundan (devralan node kaldığı yerden devam eder);
+    ilk seferde yerel state.json'daki sayaçlar tohum olarak alınır.
+    """
+    if not ha_enabled():
+        return state.setdefault("aggregates", {})
+    return _ha_kv_get("aggregates") or dict(state.get("aggregates") or {})
+
+
+def _agg_store(agg: Dict) -> None:
+    """
+    Tur sonunda tek yazım (HA). BEGIN IMMEDIATE içinde kiranın hâlâ bizde olduğu doğrulanır:
+    kirayı kaybetmiş eski lider yeni liderin sayaçlarını ezmesin.
+    HA kapalıyken sayaçlar state içinde; çağıran state'i kaydeder.
+    """
+    if not ha_enabled():
+        return
+    con = _ha_connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT owner FROM leader WHERE name = ?", (HA_LEASE_NAME,)).fetchone()
+            if row is None or row[0] != _ha_node_id:
+                raise LeadershipLostError("HA kirası kaybedildi; özet sayaçları yazılmadı")
+            con.execute("INSERT OR REPLACE INTO kv (name, value) VALUES ('aggregates', ?)",
+                        (json.dumps(agg, ensure_ascii=False),))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+
+def aggregate_deposit(agg: Dict, item: Dict) -> None:
+    """
+    Gönderilen depositi işlendiği anın saat/gün kovasına ekle (sadece bellekte; O(1)).
+    createdAt kullanılmaz: geç gelen deposit zaten raporlanmış bir kovaya düşmesin.
+    Kova: {"n": adet, "usdt": toplam, "symbol": {ad: [adet, usdt]}, "country": {ad: [adet, usdt]}}
+    """
+    lt = time.localtime()
+    usdt = _to_float(item.get("usdtAmount")) or 0.0
+    dims = (("symbol", str(item.get("symbol") or "-")), ("country", str(item.get("countryNameResolved") or "-")))
+    for period, fmt in _AGG_PERIOD_FORMATS.items():
+        buckets = agg.setdefault(period, {})
+        key = time.strftime(fmt, lt)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {"n": 0, "usdt": 0.0, "symbol": {}, "country": {}}
+            # Eski kovaları at (tutulacak sayı AGG_BUCKETS_KEEP)
+            for old_key in sorted(buckets)[:-AGG_BUCKETS_KEEP[period]]:
+                del buckets[old_key]
+        bucket["n"] += 1
+        bucket["usdt"] += usdt
+        for dim, val in dims:
+            counter = bucket[dim].setdefault(val, [0, 0.0])
+            counter[0] += 1
+            counter[1] += usdt
+
+
+def build_report_message(period: str, key: str, bucket: Optional[Dict]) -> str:
+    """
+    Kapanan kovanın özeti; maliyet deposit sayısından değil kova içindeki symbol/country sayısından.
+    """
+    bucket = bucket or {"n": 0, "usdt": 0.0, "symbol": {}, "country": {}}
+    total_usdt = format_number(f"{bucket['usdt']:.2f}")
+    lines = [
+        f"📊 {_AGG_PERIOD_TITLES[period]} Özet ({key})",
+        "",
+        f"Toplam: {bucket['n']} deposit | {total_usdt} USDT",
+    ]
+    for dim, title in (("symbol", "Symbol"), ("country", "Country")):
+        rows = sorted(bucket[dim].items(), key=lambda kv: kv[1][1], reverse=True)
+        if not rows:
+            continue
+        lines += ["", f"{title}:"]
+        lines += [f"{name}: {n} | {format_number(f'{usdt:.2f}')} USDT" for name, (n, usdt) in rows]
+    return "\n".join(lines)
+
+
+def maybe_emit_reports(agg: Dict, bot_token: str, chat_id: str, thread_id: Optional[int]) -> bool:
+    """
+    Kapanmış ve henüz raporlanmamış tüm kovaların özetini sırayla Telegram'a gönder:
+    son raporlanan anahtardan (last_keys) sonraki, şimdiki kovadan eski her kova. Restart / failover
+    sonrası aradaki saatler de raporlanır. Önceki turun kovası boş olsa da raporlanır.
+    agg değiştiyse True döner (çağıran _agg_store ile kaydeder).
+    """
+    if not _reports_enabled:
+        return False
+    last_keys = agg.setdefault("last_keys", {})
+    now = time.localtime()
+    changed = False
+    for period in _reports_enabled:
+        current = time.strftime(_AGG_PERIOD_FORMATS[period], now)
+        last = last_keys.get(period)
+        if last is None or last >= current:
+            if last is None:
+                last_keys[period] = current
+                changed = True
+            continue
+        # Anahtar biçimleri sıralanabilir (YYYY-MM-DD [HH:00])
+        buckets = agg.get(period, {})
+        due = sorted({last} | {k for k in buckets if last < k < current})
+        for i, key in enumerate(due):
+            text = build_report_message(period, key, buckets.get(key))
+            if not send_telegram_message(bot_token, chat_id, text, thread_id):
+                break  # kalanlar sonraki turda
+            logging.info("%s özet gönderildi (%s).", _AGG_PERIOD_TITLES[period], key)
+            # last_keys = raporlanmamış en eski kova; gönderim yarıda kalırsa oradan devam edilir
+            last_keys[period] = due[i + 1] if i + 1 < len(due) else current
+            changed = True
+    return changed
+
+
 def bootstrap_state_with_current_list(state: Dict, deposits: List[Dict]) -> Dict:
     if not deposits:
         state["bootstrap_done"] = True; save_state(STATE_FILE, state); return state
@@ -316,14 +1272,23 @@ def bootstrap_state_with_current_list(state: Dict, deposits: List[Dict]) -> Dict
     state["processed_ids"] = deduped[-5000:]
     state["last_seen_created_at"] = max_created
     state["bootstrap_done"] = True
+    if _track_status:
+        diff_status_index(state, deposits)
     save_state(STATE_FILE, state)
     return state
 
 
-def detect_new_deposits(state: Dict, deposits: List[Dict]) -> List[Dict]:
+def detect_new_deposits(state: Dict, deposits: List[Dict], dropped: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Yeni adayları döndür. Kurallar (--rules-file) burada, zenginleştirmeden önce uygulanır;
+    Elenen deposit terminal durumdaysa 'dropped' listesine eklenir (çağıran state'e işlenmiş
+    olarak yazar). Terminal olmayan (ör. Pending) elenenler işlenmiş sayılmaz: durum değişince
+    (ör. Completed) sonraki turlarda kurallar tekrar değerlendirilir.
+    """
     last_seen_created = int(state.get("last_seen_created_at", 0) or 0)
     processed_ids = set(state.get("processed_ids", []))
     candidates: List[Dict] = []
+    _load_rules_if_needed()
     for item in deposits:
         _id = item.get("id")
         created_at = int(item.get("CreatedAt", item.get("createdAt", 0)) or 0)  # CreatedAt guard
@@ -334,6 +1299,10 @@ def detect_new_deposits(state: Dict, deposits: List[Dict]) -> List[Dict]:
         is_new_by_id = normalized_id not in processed_ids
         is_new_by_time = created_at > last_seen_created
         if is_new_by_id or is_new_by_time:
+            if not evaluate_rules(item):
+                if dropped is not None and _is_terminal_status(str(item.get("statusDesc", ""))):
+                    dropped.append(item)
+                continue
             candidates.append(item)
     candidates.sort(key=lambda x: int(x.get("createdAt", 0) or 0))
     return candidates
@@ -361,9 +1330,321 @@ def update_state_after_send(state: Dict, sent_items: List[Dict]) -> Dict:
     return state
 
 
+def _normalize_deposit_id(_id) -> str:
+    try:
+        return str(int(_id))
+    except Exception:
+        return str(_id)
+
+
+def _ha_connect() -> sqlite3.Connection:
+    # isolation_level=None: BEGIN/COMMIT'i elle yönetiyoruz (BEGIN IMMEDIATE ile yazma kilidi)
+    return sqlite3.connect(_ha_db_path, timeout=10, isolation_level=None)
+
+
+def ha_init(db_path: str, node_id: Optional[str] = None, lease_ttl: float = HA_LEASE_TTL_SECONDS) -> None:
+    """
+    HA modunu aç: lider kirası ve bildirim sahiplenmeleri aynı SQLite dosyasında tutulur.
+    İki watcher aynı --ha-db dosyasını göstermeli (aynı host / paylaşılan yerel disk).
+    """
+    global _ha_db_path, _ha_node_id, _ha_lease_ttl
+    _ha_db_path = db_path
+    _ha_node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+    _ha_lease_ttl = max(float(HA_HEARTBEAT_SECONDS) * 2, float(lease_ttl))
+    con = _ha_connect()
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS leader (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+        # kv: node'lar arası ortak küçük JSON değerler (ör. özet sayaçları)
+        con.execute("CREATE TABLE IF NOT EXISTS kv (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # deliveries: id -> sahiplenen node + durum ('claimed' = gönderimde, 'sent' = tüm sink'lere teslim edildi)
+        con.execute("CREATE TABLE IF NOT EXISTS deliveries (id TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                    "status TEXT NOT NULL, updated_at REAL NOT NULL)")
+        # Eski şema (sent_ids) varsa kayıtları 'sent' olarak taşı
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sent_ids'").fetchone():
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("INSERT OR IGNORE INTO deliveries (id, owner, status, updated_at) "
+                        "SELECT id, '', 'sent', sent_at FROM sent_ids")
+            con.execute("DROP TABLE sent_ids")
+            con.execute("COMMIT")
+    finally:
+        con.close()
+    logging.info("HA modu aktif (node=%s, db=%s, ttl=%.0fs).", _ha_node_id, db_path, _ha_lease_ttl)
+
+
+def ha_enabled() -> bool:
+    return _ha_db_path is not None
+
+
+class LeadershipLostError(Exception):
+    """HA: tur ortasında kira kaybedildi; gönderim yapılmadan tur kesilir."""
+
+
+def ha_try_acquire_lease() -> bool:
+    """
+    Kira boşsa / süresi dolmuşsa / zaten bizdeyse al ve yenile. Lider miyiz döner.
+    HA kapalıysa her zaman True (tek instance = lider).
+    Normalde sadece heartbeat thread'inden çağrılır (bkz. ha_start_heartbeat).
+    """
+    global _ha_is_leader, _ha_lease_expires
+    if not ha_enabled():
+        return True
+    with _ha_lock:
+        now = time.time()
+        was_leader = _ha_is_leader
+        try:
+            con = _ha_connect()
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                row = con.execute("SELECT owner, expires_at FROM leader WHERE name = ?", (HA_LEASE_NAME,)).fetchone()
+                if row is None or row[0] == _ha_node_id or row[1] < now:
+                    con.execute("INSERT OR REPLACE INTO leader (name, owner, expires_at) VALUES (?, ?, ?)",
+                                (HA_LEASE_NAME, _ha_node_id, now + _ha_lease_ttl))
+                    _ha_is_leader = True
+                    _ha_lease_expires = now + _ha_lease_ttl
+                else:
+                    _ha_is_leader = False
+                con.execute("COMMIT")
+            finally:
+                con.close()
+        except Exception as e:
+            # DB erişilemiyorsa kiranın bizde olduğunu varsayamayız → standby
+            logging.warning("HA kira güncellenemedi: %s", e)
+            _ha_is_leader = False
+        if _ha_is_leader and not was_leader:
+            logging.info("HA: lider olundu (node=%s).", _ha_node_id)
+        elif was_leader and not _ha_is_leader:
+            logging.warning("HA: liderlik kaybedildi (node=%s); standby moduna geçiliyor.", _ha_node_id)
+        return _ha_is_leader
+
+
+def ha_is_leader() -> bool:
+    """
+    Şu an gönderim yapabilir miyiz? Heartbeat geciktiyse bile kira süresi dolduktan sonra False.
+    """
+    if not ha_enabled():
+        return True
+    return _ha_is_leader and time.time() < _ha_lease_expires
+
+
+def ensure_leader() -> None:
+    if not ha_is_leader():
+        raise LeadershipLostError("HA kirası kaybedildi")
+
+
+def ha_start_heartbeat() -> None:
+    """
+    Kirayı poll döngüsünden bağımsız bir thread'de HA_HEARTBEAT_SECONDS aralıkla yenile.
+    Uzun süren turlar (retry, zenginleştirme) kiranın düşmesine yol açmaz; standby de aynı
+    thread ile kira boşalır boşalmaz devralır.
+    """
+    if not ha_enabled():
+        return
+    ha_try_acquire_lease()
+
+    def _loop():
+        while not stop_event.wait(HA_HEARTBEAT_SECONDS):
+            ha_try_acquire_lease()
+
+    threading.Thread(target=_loop, name="ha-heartbeat", daemon=True).start()
+
+
+def ha_release_lease() -> None:
+    global _ha_is_leader
+    if not ha_enabled():
+        return
+    with _ha_lock:
+        if not _ha_is_leader:
+            return
+        try:
+            con = _ha_connect()
+            try:
+                con.execute("DELETE FROM leader WHERE name = ? AND owner = ?", (HA_LEASE_NAME, _ha_node_id))
+            finally:
+                con.close()
+            _ha_is_leader = False
+            logging.info("HA: kira bırakıldı.")
+        except Exception as e:
+            logging.debug("HA kira bırakma hatası: %s", e)
+
+
+def ha_claim(key: str) -> bool:
+    """
+    Ortak depoda bildirimi gönderim için sahiplen (deliveries tablosu). Sahiplenebildiysek True:
+      - kayıt yok → 'claimed' olarak bizim adımıza yaz
+      - 'sent' → başka node zaten teslim etti, False
+      - 'claimed' ve sahibi biziz → True (outbox tekrar denemesi)
+      - 'claimed' ama sahibi artık kirayı tutmuyor (gönderemeden düştü) → devral
+    Satır ancak teslimattan sonra ha_mark_sent ile 'sent' olur. HA kapalıysa her zaman True.
+    """
+    if not ha_enabled():
+        return True
+    now = time.time()
+    con = _ha_connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT owner, status FROM deliveries WHERE id = ?", (key,)).fetchone()
+            if row is None:
+                con.execute("INSERT INTO deliveries (id, owner, status, updated_at) VALUES (?, ?, 'claimed', ?)",
+                            (key, _ha_node_id, now))
+                claimed = True
+            elif row[1] == "sent":
+                claimed = False
+            elif row[0] == _ha_node_id:
+                claimed = True
+            else:
+                lease = con.execute("SELECT owner, expires_at FROM leader WHERE name = ?", (HA_LEASE_NAME,)).fetchone()
+                claimed = lease is None or lease[0] != row[0] or lease[1] < now
+                if claimed:
+                    logging.info("HA: yarım kalan bildirim devralındı | anahtar=%s önceki=%s", key, row[0])
+                    con.execute("UPDATE deliveries SET owner = ?, updated_at = ? WHERE id = ?", (_ha_node_id, now, key))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return claimed
+    finally:
+        con.close()
+
+
+def ha_claim_deposit(item: Dict) -> bool:
+    return ha_claim(_normalize_deposit_id(item.get("id")))
+
+
+def ha_mark_sent(key: str) -> None:
+    """Bildirim tüm sink'lere teslim edildi: başka node artık devralmasın."""
+    if not ha_enabled():
+        return
+    con = _ha_connect()
+    try:
+        con.execute("UPDATE deliveries SET status = 'sent', updated_at = ? WHERE id = ?", (time.time(), key))
+    finally:
+        con.close()
+
+
+def _ha_kv_get(name: str) -> Optional[Dict]:
+    con = _ha_connect()
+    try:
+        row = con.execute("SELECT value FROM kv WHERE name = ?", (name,)).fetchone()
+    finally:
+        con.close()
+    return json.loads(row[0]) if row else None
+
+
+def _ha_kv_set(name: str, value: Dict) -> None:
+    con = _ha_connect()
+    try:
+        con.execute("INSERT OR REPLACE INTO kv (name, value) VALUES (?, ?)",
+                    (name, json.dumps(value, ensure_ascii=False)))
+    finally:
+        con.close()
+
+
+def ha_publish_watermark(state: Dict) -> None:
+    """
+    Liderin dedup filigranını (last_seen_created_at + processed_ids) ortak depoya yaz.
+    Standby poll yapmadığı için kendi state'i bootstrap anında kalır; devralınca bunu benimser
+    (deliveries tablosu HA_DEDUP_RETENTION_SECONDS sonra budanır, tek başına yetmez).
+    """
+    if not ha_enabled():
+        return
+    _ha_kv_set("watermark", {"last_seen_created_at": int(state.get("last_seen_created_at", 0) or 0),
+                             "processed_ids": state.get("processed_ids", [])})
+
+
+def ha_adopt_watermark(state: Dict) -> bool:
+    """Liderliği devralınca ortak filigranı yerel state ile birleştir. state değiştiyse True."""
+    if not ha_enabled():
+        return False
+    shared = _ha_kv_get("watermark")
+    if not shared:
+        return False
+    processed_ids = state.get("processed_ids", [])
+    known = set(processed_ids)
+    extra = [i for i in shared.get("processed_ids", []) if i not in known]
+    last_seen = max(int(state.get("last_seen_created_at", 0) or 0), int(shared.get("last_seen_created_at", 0) or 0))
+    if not extra and last_seen == state.get("last_seen_created_at"):
+        return False
+    state["processed_ids"] = (processed_ids + extra)[-5000:]
+    state["last_seen_created_at"] = last_seen
+    logging.info("HA: ortak dedup filigranı devralındı (+%s id, last_seen=%s).", len(extra), last_seen)
+    return True
+
+
+def ha_prune_dedup() -> None:
+    if not ha_enabled():
+        return
+    try:
+        con = _ha_connect()
+        try:
+            con.execute("DELETE FROM deliveries WHERE updated_at < ?", (time.time() - HA_DEDUP_RETENTION_SECONDS,))
+        finally:
+            con.close()
+    except Exception as e:
+        logging.debug("HA dedup temizleme hatası: %s", e)
+
+
+# === Yeni: Tur içi süre izleme (span'ler) + opsiyonel cProfile ===
+class TickTrace:
+    """
+    Bir poll turunun aşama süreleri. Aynı isimli span'ler toplanır (örn. user_info x N aday).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        acc = self.spans.get(name)
+        if acc is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            acc[0] += seconds
+            acc[1] += 1
+
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def summary(self) -> str:
+        parts = []
+        for name, (secs, n) in sorted(self.spans.items(), key=lambda kv: kv[1][0], reverse=True):
+            parts.append(f"{name}={secs:.2f}s" + (f"(x{n})" if n > 1 else ""))
+        return " ".join(parts) or "-"
+
+
+def log_tick_trace(trace: TickTrace, slow_threshold: float) -> None:
+    total = trace.total()
+    if total >= slow_threshold:
+        logging.warning("Yavaş tur %.2fs | %s", total, trace.summary())
+    elif logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Tur %.2fs | %s", total, trace.summary())
+
+
+def dump_profile(profiler: cProfile.Profile, out_dir: str, ticks: int) -> None:
+    """
+    N tur boyunca toplanan profili <out_dir>/profile_<zaman>.pstats (+ okunur .txt özet) olarak yaz.
+    Not: cProfile sadece ana thread'i görür; sink thread'lerindeki gönderim süreleri loglarda (send_ms).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+    profiler.dump_stats(base + ".pstats")
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    logging.info("Profil yazıldı (%s tur): %s.pstats", ticks, base)
+
+
 def handle_signals():
     def _handler(signum, frame):
-        logging.info(f"Sinyal alındı ({signum}). Bot durduruluyor...")
+        logging.info("Sinyal alındı (%s). Bot durduruluyor...", signum)
         stop_event.set()
     signal.signal(signal.SIGINT, _handler)
     signal.signal(signal.SIGTERM, _handler)
@@ -428,10 +1709,10 @@ def _read_cookies_from_browser(domain_filter: str, source: str) -> Optional[str]
         elif source == "opera":
             cj = bc3.opera()
         else:
-            logging.error(f"Geçersiz --auto-cookie kaynağı: {source}")
+            logging.error("Geçersiz --auto-cookie kaynağı: %s", source)
             return None
     except Exception as e:
-        logging.error(f"Tarayıcı cookie okunamadı ({source}): {e}")
+        logging.error("Tarayıcı cookie okunamadı (%s): %s", source, e)
         return None
 
     pairs: List[Tuple[str, str]] = []
@@ -441,7 +1722,7 @@ def _read_cookies_from_browser(domain_filter: str, source: str) -> Optional[str]
             pairs.append((c.name, c.value))
 
     if not pairs:
-        logging.warning(f"Tarayıcıdan {domain_filter} için cookie bulunamadı.")
+        logging.warning("Tarayıcıdan %s için cookie bulunamadı.", domain_filter)
         return None
 
     return _compose_cookie_header_from_items(pairs)
@@ -580,9 +1861,9 @@ def _load_country_map_if_needed() -> None:
 
         _country_code_to_names = mapping
         _country_map_mtime = mtime
-        logging.info(f"Country map yüklendi ({len(mapping)} kod).")
+        logging.info("Country map yüklendi (%s kod).", len(mapping))
     except Exception as e:
-        logging.warning(f"country_map.xlsx okunamadı: {e}")
+        logging.warning("country_map.xlsx okunamadı: %s", e)
         _country_code_to_names = {}
 
 
@@ -626,15 +1907,25 @@ def fetch_user_info(sess: requests.Session, uid: int) -> Dict[str, Optional[str]
     - Ana payload olarak {"uid": uid} dener, başarısız olursa {"id": uid} dener.
     - Başlıklar: session.headers + _api_headers() + Referer (userDetail?id=<uid>)
     Dönen yapı: {"countryCode": "...", "ip": "..."}
+    user_info devresi açıksa (veya çağrı sırasında açılırsa) kalan denemeler atlanır;
+    alarm Country bilgisi olmadan gider.
     """
+    breaker = BREAKERS["user_info"]
     headers = _api_headers().copy()
     headers["Referer"] = f"{DEFAULT_BASE_URL}/userDetail?id={uid}"
     payloads = [{"uid": uid}, {"id": uid}]
 
     last_error: Optional[Exception] = None
     for pl in payloads:
+        if not breaker.allow():
+            break
         try:
-            r = sess.post(GET_USER_INFO_ENDPOINT, json=pl, timeout=REQUEST_TIMEOUT, headers=headers)
+            try:
+                r = sess.post(GET_USER_INFO_ENDPOINT, json=pl, timeout=REQUEST_TIMEOUT, headers=headers)
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_response(r)
             if r.status_code == 401:
                 raise PermissionError("401 Unauthorized (get_user_info).")
             r.raise_for_status()
@@ -652,10 +1943,19 @@ def fetch_user_info(sess: requests.Session, uid: int) -> Dict[str, Optional[str]
             last_error = e
             continue
 
+    if not breaker.allow():
+        logging.debug("user_info devresi açık, Country atlandı (uid=%s)", uid)
+        return {"countryCode": None, "ip": None}
+
     # Fallback: userDetail sayfasını GET ile çekip regex ile ara
     try:
         url = f"{DEFAULT_BASE_URL}/userDetail?id={uid}"
-        r = sess.get(url, headers={"Cookie": raw_cookie_header}, timeout=REQUEST_TIMEOUT)
+        try:
+            r = sess.get(url, headers={"Cookie": raw_cookie_header}, timeout=REQUEST_TIMEOUT)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_response(r)
         if r.status_code == 401:
             raise PermissionError("401 Unauthorized (userDetail).")
         r.raise_for_status()
@@ -670,14 +1970,38 @@ def fetch_user_info(sess: requests.Session, uid: int) -> Dict[str, Optional[str]
 
 
     if last_error:
-        logging.warning(f"get_user_info hatası (uid={uid}): {last_error}")
+        logging.warning("get_user_info hatası (uid=%s): %s", uid, last_error)
     else:
-        logging.warning(f"get_user_info sonuçsuz (uid={uid})")
+        logging.warning("get_user_info sonuçsuz (uid=%s)", uid)
     return {"countryCode": None, "ip": None}
 
 
+def enrich_deposit_with_country(sess: requests.Session, item: Dict) -> None:
+    """
+    UID'den countryCode çek, Excel'den ülke adını çöz; mesaj için item'a yaz
+    ('countryCode', 'countryNameResolved'; bulunamazsa '-').
+    """
+    uid_val = item.get("uid")
+    try:
+        uid_int = int(uid_val)
+    except Exception:
+        uid_int = None
+
+    cc_raw = "-"
+    country_name_resolved = "-"
+
+    if uid_int is not None:
+        info = fetch_user_info(sess, uid_int)  # {"countryCode": "...", "ip": "..."}
+        if info and info.get("countryCode"):
+            cc_raw = str(info.get("countryCode"))
+            dial_tail = _parse_second_plus_code(cc_raw)  # '62'
+            country_name_resolved = resolve_country_names_from_code(dial_tail)
+
+    item["countryCode"] = cc_raw
+    item["countryNameResolved"] = country_name_resolved
+
+
 def main():
-    setup_logging()
     parser = argparse.ArgumentParser(description="ChainUp Deposit Watcher (auto-cookie + user country enrich)")
     parser.add_argument("--cookie-file", default="cookies.txt", help="Cookie dosyası (tek satır, Request Headers → Cookie)")
     parser.add_argument("--token", default=DEFAULT_TELEGRAM_BOT_TOKEN, help="Telegram bot token")
@@ -685,21 +2009,62 @@ def main():
     parser.add_argument("--thread-id", default=DEFAULT_TELEGRAM_THREAD_ID, type=int, nargs="?", help="Opsiyonel Telegram topic/thread id")
     parser.add_argument("--interval", default=POLL_INTERVAL_SECONDS, type=int, help="Sorgu aralığı saniye")
     parser.add_argument("--auto-cookie", choices=["edge","chrome","firefox","brave","opera"], help="Tarayıcıdan cookie otomatik çek")
+    parser.add_argument("--ha-db", default=None, help="HA modu: iki watcher'ın paylaştığı SQLite dosyası (lider kirası + dedup)")
+    parser.add_argument("--ha-node-id", default=None, help="HA node adı (varsayılan host:pid)")
+    parser.add_argument("--ha-lease-ttl", default=HA_LEASE_TTL_SECONDS, type=float, help="HA lider kirası süresi (saniye)")
+    parser.add_argument("--sinks-file", default=None, help="Bildirim sink'leri (JSON: telegram/webhook/file/stdout); yoksa sadece Telegram")
+    parser.add_argument("--rules-file", default=None, help="Filtre/yönlendirme kuralları (JSON, değişince otomatik yeniden yüklenir)")
+    parser.add_argument("--track-status", action="store_true", help="Görülmüş depositlerin statusDesc/amount değişimini bildir")
+    parser.add_argument("--terminal-statuses", default=None, help="Virgülle terminal statusDesc değerleri (varsayılan: %s)" % ",".join(TERMINAL_STATUSES))
+    parser.add_argument("--templates-file", default=None, help="Mesaj şablonları (JSON; HTML/Markdown, değişince otomatik yeniden yüklenir)")
+    parser.add_argument("--reports", default="", help="Özet raporlar: virgülle hourly,daily (Telegram'a gönderilir)")
+    parser.add_argument("--slow-tick", default=SLOW_TICK_SECONDS, type=float, help="Bu süreyi (sn) aşan turlar aşama dökümüyle loglanır")
+    parser.add_argument("--profile", default=0, type=int, metavar="N", help="İlk N turu cProfile ile profille ve istatistik dosyası yaz")
+    parser.add_argument("--profile-dir", default="profiles", help="--profile çıktı klasörü")
+    parser.add_argument("--log-queue", action="store_true", help="Log I/O'yu arka plan thread'ine taşı (QueueHandler/QueueListener)")
+    parser.add_argument("--log-json", action="store_true", help="Log dosyasını JSON-lines yaz (deposit alanlarıyla)")
     args = parser.parse_args()
+    setup_logging(use_queue=args.log_queue, json_lines=args.log_json)
 
     bot_token = args.token
     chat_id = args.chat_id
     thread_id = args.thread_id
     interval = max(10, int(args.interval))
-    global auto_cookie_source
+    global auto_cookie_source, _rules_file, _templates_file, _reports_enabled, _track_status, _terminal_statuses
     auto_cookie_source = args.auto_cookie
+    _rules_file = args.rules_file
+    _templates_file = args.templates_file
+    _reports_enabled = tuple(p.strip() for p in args.reports.split(",") if p.strip())
+    bad_reports = [p for p in _reports_enabled if p not in _AGG_PERIOD_FORMATS]
+    if bad_reports:
+        parser.error(f"--reports: geçersiz periyot {', '.join(bad_reports)} (hourly, daily)")
+    _track_status = args.track_status
+    if args.terminal_statuses:
+        _terminal_statuses = frozenset(x.strip().lower() for x in args.terminal_statuses.split(",") if x.strip())
+
+    if args.ha_db:
+        try:
+            ha_init(args.ha_db, args.ha_node_id, args.ha_lease_ttl)
+        except Exception as e:
+            logging.error("HA veritabanı açılamadı: %s", e)
+            sys.exit(1)
+        ha_start_heartbeat()
 
-    # Başlangıçta country_map.xlsx yükle
+    try:
+        sinks = load_sinks(args.sinks_file, bot_token, chat_id, thread_id)
+    except Exception as e:
+        logging.error("Sink yapılandırması yüklenemedi: %s", e)
+        sys.exit(1)
+    sinks_by_name = {sk.name: sk for sk in sinks}
+
+    # Başlangıçta country_map.xlsx, kuralları ve şablonları yükle
     _load_country_map_if_needed()
+    _load_rules_if_needed()
+    _load_templates_if_needed()
 
     # Eğer --auto-cookie verildiyse önce tarayıcıdan okumayı dene ve dosyaya yaz
     if auto_cookie_source:
-        logging.info(f"--auto-cookie aktif ({auto_cookie_source}). Tarayıcıdan cookie çekilecek.")
+        logging.info("--auto-cookie aktif (%s). Tarayıcıdan cookie çekilecek.", auto_cookie_source)
         try:
             header_from_browser = _read_cookies_from_browser(TARGET_COOKIE_DOMAIN, auto_cookie_source)
             if header_from_browser:
@@ -707,13 +2072,13 @@ def main():
                     logging.info("İlk başlatmada cookie tarayıcıdan yazıldı (cookies.txt).")
                     send_telegram_message(bot_token, chat_id, "🔑 Cookie otomatik güncellendi (tarayıcı).", thread_id)
         except Exception as e:
-            logging.warning(f"İlk tarayıcı cookie yazımı başarısız: {e}")
+            logging.warning("İlk tarayıcı cookie yazımı başarısız: %s", e)
 
     # İlk cookie yükle
     try:
         sess = reload_cookies_and_session(args.cookie_file)
     except Exception as e:
-        logging.error(f"Cookie yüklenemedi: {e}")
+        logging.error("Cookie yüklenemedi: %s", e)
         sys.exit(1)
 
     # İlk Country map mtime’ı not et
@@ -725,11 +2090,15 @@ def main():
             send_telegram_message(bot_token, chat_id, "⛔ Bot durduruldu", thread_id)
         except Exception:
             pass
+        close_sinks(sinks)
+        # Standby'ın beklemeden devralabilmesi için kirayı bırak (heartbeat tekrar almasın diye önce durdur)
+        stop_event.set()
+        ha_release_lease()
     atexit.register(on_exit)
 
     # Sinyaller
     def _handler(signum, frame):
-        logging.info(f"Sinyal alındı ({signum}). Bot durduruluyor...")
+        logging.info("Sinyal alındı (%s). Bot durduruluyor...", signum)
         stop_event.set()
     signal.signal(signal.SIGINT, _handler)
     signal.signal(signal.SIGTERM, _handler)
@@ -747,102 +2116,182 @@ def main():
         if refreshed is not None:
             sess = refreshed
         initial_list = fetch_deposits(sess)
-        logging.info(f"İlk listede {len(initial_list)} kayıt bulundu.")
+        logging.info("İlk listede %s kayıt bulundu.", len(initial_list))
         if not state.get("bootstrap_done", False):
             state = bootstrap_state_with_current_list(state, initial_list)
             logging.info("Bootstrap tamamlandı; yeni kayıtlar bildirilecek.")
     except PermissionError as e:
-        logging.error(f"401 (oturum) - cookie güncel değil: {e}")
+        logging.error("401 (oturum) - cookie güncel değil: %s", e)
         sys.exit(2)
     except ValueError as e:
-        logging.error(f"İlk fetch hata: {e} (muhtemelen code=10004 / oturum reddi)")
+        logging.error("İlk fetch hata: %s (muhtemelen code=10004 / oturum reddi)", e)
     except Exception as e:
-        logging.error(f"İlk fetch sırasında beklenmeyen hata: {e}")
+        logging.error("İlk fetch sırasında beklenmeyen hata: %s", e)
+
+    profiler: Optional[cProfile.Profile] = cProfile.Profile() if args.profile > 0 else None
+    profiled_ticks = 0
+    was_leader = False
 
     while not stop_event.is_set():
         loop_start = time.time()
+        trace = TickTrace()
+        if profiler is not None:
+            profiler.enable()
+        reset_retry_budget()
+
+        # HA: kira heartbeat thread'inde yenilenir. Standby poll/gönderim yapmaz ama session + country map'i sıcak tutar.
+        is_leader = ha_is_leader()
+        if is_leader and not was_leader:
+            # Devralınca önceki liderin dedup filigranını benimse (okunamazsa bu tur poll yapılmaz)
+            try:
+                if ha_adopt_watermark(state):
+                    save_state(STATE_FILE, state)
+            except Exception as e:
+                logging.warning("HA dedup filigranı okunamadı, poll ertelendi: %s", e)
+                is_leader = False
+        was_leader = is_leader
 
         # --auto-cookie: tarayıcıdan cookie tazele (her turda dener, değişmişse uygular)
-        try:
-            refreshed = maybe_refresh_cookie_from_browser(args.cookie_file, bot_token, chat_id, thread_id)
-            if refreshed is not None:
-                sess = refreshed
-        except Exception as e:
-            logging.debug(f"Tarayıcıdan cookie tazeleme hatası: {e}")
+        # Standby'da atlanır: lider cookies.txt'yi yazar, standby mtime değişiminden alır.
+        if is_leader:
+            try:
+                with trace.span("cookie_browser"):
+                    refreshed = maybe_refresh_cookie_from_browser(args.cookie_file, bot_token, chat_id, thread_id)
+                if refreshed is not None:
+                    sess = refreshed
+            except Exception as e:
+                logging.debug("Tarayıcıdan cookie tazeleme hatası: %s", e)
 
         # cookies.txt manuel değiştiyse yeniden yükle (ör. sen elle değiştin)
         try:
             current_mtime = os.path.getmtime(args.cookie_file)
             if cookie_file_mtime is None or current_mtime != cookie_file_mtime:
                 logging.info("Cookie dosyasında değişiklik algılandı (MANUEL).")
-                sess = reload_cookies_and_session(args.cookie_file)
-                send_telegram_message(bot_token, chat_id, "📝 Cookie manuel güncellendi (dosya).", thread_id)
+                with trace.span("cookie_reload"):
+                    sess = reload_cookies_and_session(args.cookie_file)
+                if ha_is_leader():
+                    send_telegram_message(bot_token, chat_id, "📝 Cookie manuel güncellendi (dosya).", thread_id)
         except Exception as e:
-            logging.debug(f"Cookie mtime kontrol hatası: {e}")
+            logging.debug("Cookie mtime kontrol hatası: %s", e)
 
         # Country map değiştiyse yeniden yükle (opsiyonel izleme)
         try:
             if os.path.exists(COUNTRY_MAP_XLSX):
                 cm_m = os.path.getmtime(COUNTRY_MAP_XLSX)
                 if _country_map_mtime is None or cm_m != _country_map_mtime:
-                    _load_country_map_if_needed()
+                    with trace.span("country_map"):
+                        _load_country_map_if_needed()
         except Exception as e:
-            logging.debug(f"country_map.xlsx mtime kontrol hatası: {e}")
+            logging.debug("country_map.xlsx mtime kontrol hatası: %s", e)
 
-        try_keepalive(sess)
+        # Şablon dosyası değiştiyse yeniden derle
+        _load_templates_if_needed()
+
+        with trace.span("keepalive"):
+            try_keepalive(sess)
 
         new_items_sent: List[Dict] = []
-        try:
-            deposit_list = fetch_deposits(sess)
-            candidates = detect_new_deposits(state, deposit_list)
-            if candidates:
-                for item in candidates:
-                    # === Yeni: UID'den countryCode çek ===
-                    uid_val = item.get("uid")
-                    try:
-                        uid_int = int(uid_val)
-                    except Exception:
-                        uid_int = None
-
-                    cc_raw = "-"
-                    country_name_resolved = "-"
-
-                    if uid_int is not None:
-                        info = fetch_user_info(sess, uid_int)  # {"countryCode": "...", "ip": "..."}
-                        if info and info.get("countryCode"):
-                            cc_raw = str(info.get("countryCode"))
-                            dial_tail = _parse_second_plus_code(cc_raw)  # '62'
-                            country_name_resolved = resolve_country_names_from_code(dial_tail)
-
-                    # Mesajda kullanılmak üzere item'ı zenginleştir
-                    item["countryCode"] = cc_raw
-                    item["countryNameResolved"] = country_name_resolved
-
-                    text = build_telegram_message(item)
-                    ok = send_telegram_message(bot_token, chat_id, text, thread_id)
-                    if ok:
-                        logging.info(f"Telegram'a gönderildi | id={item.get('id')} createdAt={item.get('createdAt')}")
-                        new_items_sent.append(item)
-                    else:
-                        logging.error(f"Telegram gönderimi başarısız | id={item.get('id')}")
-                if new_items_sent:
-                    state = update_state_after_send(state, new_items_sent)
-            else:
-                logging.info("Yeni deposit yok.")
-        except PermissionError as e:
-            logging.warning(f"401 alındı, cookie yeniden okunacak: {e}")
+        index_dirty = False
+        if not is_leader:
+            logging.debug("HA standby: poll atlandı.")
+        else:
+            # Önceki turlardan biten gönderimleri işle, teslim edilemeyen sink'leri tekrar kuyruğa bırak
+            completed, outbox_dirty = [], False
             try:
-                refreshed = maybe_refresh_cookie_from_browser(args.cookie_file, bot_token, chat_id, thread_id)
-                if refreshed is not None:
-                    sess = refreshed
+                with trace.span("outbox"):
+                    completed, outbox_dirty = outbox_collect(state)
+                    outbox_dirty = outbox_retry(state, sinks_by_name) or outbox_dirty
+            except Exception as e:
+                logging.error("Outbox işlenirken beklenmeyen hata: %s", e)
+            # Özet sayaçları turda bir kez okunur, bellekte güncellenir, tur sonunda tek seferde yazılır
+            agg: Optional[Dict] = None
+            agg_dirty = False
+            if _reports_enabled:
+                try:
+                    agg = _agg_load(state)
+                except Exception as e:
+                    logging.warning("Özet sayaçları okunamadı, bu tur atlandı: %s", e)
+            try:
+                ha_prune_dedup()
+                with trace.span("fetch_deposits"):
+                    deposit_list = fetch_deposits(sess)
+                with trace.span("detect"):
+                    candidates = detect_new_deposits(state, deposit_list, dropped=new_items_sent)
+                if new_items_sent:
+                    logging.debug("Kurallarla elenen: %s", len(new_items_sent))
+                if candidates:
+                    for item in candidates:
+                        ensure_leader()
+                        # HA: diğer node bu id'yi zaten gönderdiyse sadece state'e işle
+                        try:
+                            claimed = ha_claim_deposit(item)
+                        except Exception as e:
+                            logging.warning("HA dedup sahiplenme hatası (id=%s): %s", item.get('id'), e)
+                            continue
+                        if not claimed:
+                            logging.info("Diğer node tarafından gönderilmiş, atlandı | id=%s", item.get('id'))
+                            new_items_sent.append(item)
+                            continue
+
+                        # Yönlendirme zenginleştirmeden önce: hiçbir sink almıyorsa HTTP çağrısı yapma
+                        routed = [sk.name for sk in sinks if sk.accepts(item)]
+                        if not routed:
+                            logging.debug("Hiçbir sink için uygun değil, atlandı | id=%s", item.get('id'))
+                            ha_mark_sent(_normalize_deposit_id(item.get("id")))
+                            new_items_sent.append(item)
+                            continue
+
+                        t_enrich = time.perf_counter()
+                        enrich_deposit_with_country(sess, item)
+                        enrich_ms = (time.perf_counter() - t_enrich) * 1000
+                        trace.add("user_info", enrich_ms / 1000)
+
+                        # Outbox'a yaz ve sink'lere paralel bırak (beklemeden sıradaki adaya geç).
+                        # Deposit işlenmiş sayılır; teslim edilemeyen sink'ler outbox'tan tekrar denenir.
+                        key = _normalize_deposit_id(item.get("id"))
+                        entry = outbox_add(state, key, "deposit", item, routed, enrich_ms=round(enrich_ms, 1))
+                        with trace.span("render"):
+                            outbox_dispatch(key, entry, sinks_by_name)
+                        new_items_sent.append(item)
+                        if agg is not None:
+                            aggregate_deposit(agg, item)
+                            agg_dirty = True
                 else:
-                    sess = reload_cookies_and_session(args.cookie_file)
-            except Exception as e2:
-                logging.error(f"Cookie yeniden yüklenemedi: {e2}")
-        except ValueError as e:
-            msg = str(e)
-            if "10004" in msg or "not logged in" in msg.lower():
-                logging.warning("API '10004 / not logged in' tespit edildi. Cookie tazeleniyor...")
+                    logging.info("Yeni deposit yok.")
+
+                if _track_status:
+                    with trace.span("status_track"):
+                        status_changes, index_dirty = diff_status_index(state, deposit_list)
+                    candidate_ids = {_normalize_deposit_id(x.get("id")) for x in candidates}
+                    for item, old_fp in status_changes:
+                        ensure_leader()
+                        if _normalize_deposit_id(item.get("id")) in candidate_ids or not evaluate_rules(item):
+                            continue
+                        # HA: olay anahtarı id@yeni_durum@miktar (devralan node aynı değişimi tekrar bildirmesin;
+                        # aynı durumda miktar düzeltmesi ayrı olaydır)
+                        item_key = _normalize_deposit_id(item.get("id"))
+                        event_key = "@".join([item_key] + _status_fingerprint(item))
+                        try:
+                            if not ha_claim(event_key):
+                                continue
+                        except Exception as e:
+                            # Eski parmak izine dön: değişim sonraki turda tekrar algılanır
+                            logging.warning("HA dedup sahiplenme hatası (olay=%s): %s", event_key, e)
+                            state["status_index"][item_key] = old_fp
+                            continue
+                        routed = [sk.name for sk in sinks if sk.accepts(item)]
+                        if not routed:
+                            ha_mark_sent(event_key)
+                            continue
+                        logging.info("Durum değişti | id=%s %s -> %s", item.get('id'), old_fp[0], item.get('statusDesc'))
+                        entry = outbox_add(state, event_key, "status", item, routed, old_fp=old_fp)
+                        outbox_dispatch(event_key, entry, sinks_by_name)
+            except CircuitOpenError as e:
+                logging.warning("Deposit sorgusu atlandı: %s", e)
+            except LeadershipLostError as e:
+                logging.warning("Tur kesildi, gönderim yapılmadı: %s", e)
+            except PermissionError as e:
+                logging.warning("401 alındı, cookie yeniden okunacak: %s", e)
                 try:
                     refreshed = maybe_refresh_cookie_from_browser(args.cookie_file, bot_token, chat_id, thread_id)
                     if refreshed is not None:
@@ -850,11 +2299,68 @@ def main():
                     else:
                         sess = reload_cookies_and_session(args.cookie_file)
                 except Exception as e2:
-                    logging.error(f"Cookie yeniden yüklenemedi: {e2}")
-            else:
-                logging.error(f"Deposit sorgusunda hata: {e}")
-        except Exception as e:
-            logging.error(f"Deposit sorgusunda beklenmeyen hata: {e}")
+                    logging.error("Cookie yeniden yüklenemedi: %s", e2)
+            except ValueError as e:
+                msg = str(e)
+                if "10004" in msg or "not logged in" in msg.lower():
+                    logging.warning("API '10004 / not logged in' tespit edildi. Cookie tazeleniyor...")
+                    try:
+                        refreshed = maybe_refresh_cookie_from_browser(args.cookie_file, bot_token, chat_id, thread_id)
+                        if refreshed is not None:
+                            sess = refreshed
+                        else:
+                            sess = reload_cookies_and_session(args.cookie_file)
+                    except Exception as e2:
+                        logging.error("Cookie yeniden yüklenemedi: %s", e2)
+                else:
+                    logging.error("Deposit sorgusunda hata: %s", e)
+            except Exception as e:
+                logging.error("Deposit sorgusunda beklenmeyen hata: %s", e)
+
+            # Bu turda zaten biten gönderimleri de topla (beklemeden)
+            try:
+                with trace.span("outbox"):
+                    done_now, changed_now = outbox_collect(state)
+                completed += done_now
+                outbox_dirty = outbox_dirty or changed_now
+            except Exception as e:
+                logging.error("Outbox işlenirken beklenmeyen hata: %s", e)
+            for entry in completed:
+                _log_delivered(entry)
+            with trace.span("reports"):
+                reports_sent = (agg is not None and ha_is_leader()
+                                and maybe_emit_reports(agg, bot_token, chat_id, thread_id))
+                if agg_dirty or reports_sent:
+                    try:
+                        _agg_store(agg)
+                    except Exception as e:
+                        logging.warning("Özet sayaçları yazılamadı: %s", e)
+            with trace.span("state_save"):
+                if new_items_sent:
+                    state = update_state_after_send(state, new_items_sent)
+                    try:
+                        ha_publish_watermark(state)
+                    except Exception as e:
+                        logging.warning("HA dedup filigranı yazılamadı: %s", e)
+                elif index_dirty or reports_sent or outbox_dirty or completed:
+                    save_state(STATE_FILE, state)
+
+        # Devre kesici / retry bütçesi durumu (sadece normal dışıysa)
+        states = breaker_states()
+        if _retry_budget_left <= 0 or any(v != "closed" for v in states.values()):
+            logging.warning("Devre durumu: %s | kalan retry bütçesi=%s",
+                            " ".join(f"{k}={v}" for k, v in states.items()), max(0, _retry_budget_left))
+
+        log_tick_trace(trace, args.slow_tick)
+        if profiler is not None:
+            profiler.disable()
+            profiled_ticks += 1
+            if profiled_ticks >= args.profile:
+                try:
+                    dump_profile(profiler, args.profile_dir, profiled_ticks)
+                except Exception as e:
+                    logging.error("Profil yazılamadı: %s", e)
+                profiler = None
 
         # Bekleme (dilimli; stop_event erken çıkabilir)
         elapsed = time.time() - loop_start
@@ -864,6 +2370,26 @@ def main():
             chunk = min(1.0, sleep_s - slept)
             time.sleep(chunk)
             slept += chunk
+            # HA: standby, heartbeat thread'i kirayı alınca beklemeden devralır
+            if not is_leader and ha_is_leader():
+                break
+
+    # Uçuştaki gönderimleri bitir (kuyrukta bekleyenler iptal → outbox'ta kalır) ve sonucu kaydet
+    close_sinks(sinks)
+    try:
+        completed, _ = outbox_collect(state)
+        for entry in completed:
+            _log_delivered(entry)
+        save_state(STATE_FILE, state)
+    except Exception as e:
+        logging.error("Kapanışta outbox kaydedilemedi: %s", e)
+
+    # N tura ulaşmadan durdurulduysa eldeki profili yine de yaz
+    if profiler is not None and profiled_ticks:
+        try:
+            dump_profile(profiler, args.profile_dir, profiled_ticks)
+        except Exception as e:
+            logging.error("Profil yazılamadı: %s", e)
 
     logging.info("Bot durduruldu.")
 